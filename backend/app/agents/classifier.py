@@ -2,19 +2,71 @@
 Query classification agent
 Categorizes customer queries into Technical, Billing, or General
 """
+import asyncio
 import logging
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models.schemas import CustomerSupportState
 from app.config.settings import get_settings
+from app.llm.client import get_async_llm
+from app.agents._prompts import CATEGORY_PROMPT
+from app.cache import semantic_cache
+from app.agents.context import RequestContext, get_request_context
+from app.agents.classifier_local import classify_category
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-def categorize_inquiry(state: CustomerSupportState) -> Dict[str, str]:
+@lru_cache(maxsize=1)
+def _llm() -> ChatOpenAI:
+    """Shared small-model LLM client; a single-word label needs neither gpt-4o nor long outputs"""
+    return get_async_llm(model=settings.llm_model_small, max_tokens=5)
+
+
+_VALID_CATEGORIES = frozenset({"Technical", "Billing", "General"})
+
+
+# Prompt | LLM chains, compiled once at import
+CATEGORY_CHAIN = ChatPromptTemplate.from_template(CATEGORY_PROMPT) | _llm()
+
+
+def _known_category(ctx: RequestContext) -> Optional[str]:
+    """Category available without the LLM: a semantically similar cached query, then the local classifier"""
+    # Reuse the category of a semantically similar query if we have one
+    cached_category = semantic_cache.lookup(ctx, "category")
+    if cached_category:
+        logger.info(f"Query categorized as: {cached_category} (cached)")
+        return cached_category
+    
+    # Nearest-centroid classification; the LLM only decides low-confidence queries
+    local_category = classify_category(ctx)
+    if local_category:
+        logger.info(f"Query categorized as: {local_category} (local)")
+    return local_category
+
+
+def _validate_category(ctx: RequestContext, content: str) -> str:
+    """Validate the LLM's category, caching it if valid"""
+    # Accept "technical", "TECHNICAL." etc. rather than defaulting
+    words = content.split()
+    category = words[0].strip(".*\"'").title() if words else ""
+    
+    # Validate category
+    if category not in _VALID_CATEGORIES:
+        logger.warning(f"Invalid category '{category}', defaulting to 'General'")
+        category = "General"
+    else:
+        semantic_cache.store(ctx, "category", category)
+    
+    logger.info(f"Query categorized as: {category}")
+    return category
+
+
+async def acategorize_inquiry(state: CustomerSupportState) -> Dict[str, str]:
     """
     Categorize customer query into: Technical, Billing, or General
     
@@ -25,55 +77,17 @@ def categorize_inquiry(state: CustomerSupportState) -> Dict[str, str]:
         Dictionary with query_category field
     """
     query = state["customer_query"]
+    ctx = get_request_context(state)
     logger.info(f"Categorizing query: {query[:100]}...")
     
-    # Category classification prompt
-    CATEGORY_PROMPT = """
-    You are a customer support query classifier. Your job is to categorize the incoming customer query
-    into one of the following categories:
-
-    1. **Technical**: Queries related to technical issues, integrations, APIs, SDKs, deployment, 
-       infrastructure, performance, security, or any technology-related topics.
-
-    2. **Billing**: Queries related to pricing, payments, invoices, subscriptions, refunds, 
-       upgrades, downgrades, or any financial matters.
-
-    3. **General**: Queries about company information, support channels, policies, general questions,
-       or anything that doesn't fit Technical or Billing categories.
-
-    Analyze the customer query and return ONLY the category name (Technical, Billing, or General).
-    Do not include any explanation, just the category name.
-
-    Customer Query:
-    {customer_query}
-
-    Category:
-    """
+    # Embedding (if not prefetched) and first-use centroid building block, so run off the loop
+    known_category = await asyncio.to_thread(_known_category, ctx)
+    if known_category:
+        return {"query_category": known_category}
     
     try:
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.llm_temperature,
-            openai_api_key=settings.openai_api_key
-        )
-        
-        # Create prompt and invoke
-        prompt = ChatPromptTemplate.from_template(CATEGORY_PROMPT)
-        chain = prompt | llm
-        
-        response = chain.invoke({"customer_query": query})
-        category = response.content.strip()
-        
-        # Validate category
-        valid_categories = ["Technical", "Billing", "General"]
-        if category not in valid_categories:
-            logger.warning(f"Invalid category '{category}', defaulting to 'General'")
-            category = "General"
-        
-        logger.info(f"Query categorized as: {category}")
-        
-        return {"query_category": category}
+        response = await CATEGORY_CHAIN.ainvoke({"customer_query": query})
+        return {"query_category": _validate_category(ctx, response.content)}
         
     except Exception as e:
         logger.error(f"Error categorizing query: {e}")
@@ -0,0 +1,320 @@
+"""
+Local embedding-based classifier
+Labels queries by cosine similarity to per-label centroids instead of calling the LLM
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.database.vectordb import get_embeddings
+from app.embeddings.local_bge import LocalBGEEmbeddings
+from app.cache.semantic_cache import normalize_embedding
+from app.agents.context import RequestContext
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+# Seed phrases used to build one centroid per label
+CATEGORY_SEEDS: Dict[str, List[str]] = {
+    "Technical": [
+        "How do I integrate your API with my application?",
+        "The SDK throws an error when I call the endpoint",
+        "How do I deploy the service on AWS?",
+        "My API requests are timing out",
+        "How do I configure webhooks?",
+        "Which programming languages does your SDK support?",
+        "I'm getting a 401 unauthorized error from the API",
+        "How do I rotate my API keys?",
+        "Does the platform support single sign-on?",
+        "How can I improve query performance?",
+        "The dashboard is not loading in my browser",
+        "How do I set up the Docker container?",
+        "What are the API rate limits?",
+        "How do I connect to the database from my app?",
+        "Is data encrypted at rest and in transit?",
+        "How do I migrate my data to your platform?",
+        "The integration with Salesforce stopped syncing",
+        "How do I enable two-factor authentication?",
+        "What is the uptime SLA of the infrastructure?",
+        "How do I debug failed webhook deliveries?",
+    ],
+    "Billing": [
+        "What payment methods do you support?",
+        "How much does the premium plan cost?",
+        "I was charged twice this month",
+        "How do I get a refund?",
+        "Can I download my invoice?",
+        "How do I upgrade my subscription?",
+        "How do I downgrade to a cheaper plan?",
+        "When will my card be billed?",
+        "Do you offer annual billing discounts?",
+        "How do I cancel my subscription?",
+        "Can I change the credit card on file?",
+        "Why did my bill increase?",
+        "Do you accept PayPal or bank transfers?",
+        "Is there a free trial before I pay?",
+        "How is usage-based pricing calculated?",
+        "Can I get a receipt for my last payment?",
+        "Do you charge VAT or sales tax?",
+        "What happens if my payment fails?",
+        "Can I pay with a purchase order?",
+        "How do I update my billing address?",
+    ],
+    "General": [
+        "What are your support hours?",
+        "How can I contact customer support?",
+        "Where is your company located?",
+        "What is your privacy policy?",
+        "Do you have a phone number I can call?",
+        "Tell me about your company",
+        "Do you offer training or onboarding?",
+        "Where can I find your documentation?",
+        "Are you hiring?",
+        "What languages does your support team speak?",
+        "How do I give feedback about your service?",
+        "Do you have a community forum?",
+        "What is your terms of service?",
+        "How long have you been in business?",
+        "Do you have a partner program?",
+        "Can I schedule a demo?",
+        "Who are your customers?",
+        "Do you have a status page?",
+        "How do I reach the sales team?",
+        "Hello, I have a question",
+    ],
+}
+
+SENTIMENT_SEEDS: Dict[str, List[str]] = {
+    "Positive": [
+        "Thank you for the great service!",
+        "I love this feature!",
+        "Your support team was incredibly helpful",
+        "Everything works perfectly, thanks",
+        "Great job on the latest update",
+        "I'm really happy with the product",
+        "Thanks so much for the quick response",
+        "This is exactly what I needed",
+        "Amazing experience so far",
+        "I appreciate your help",
+        "The new dashboard looks fantastic",
+        "You guys are awesome",
+        "I'm very satisfied with my subscription",
+        "Thanks, that solved my problem",
+        "Wonderful customer service",
+        "I'd recommend you to everyone",
+        "Really impressed with the performance",
+        "Keep up the good work",
+        "Thanks for making this so easy",
+        "I'm delighted with the results",
+    ],
+    "Neutral": [
+        "What payment methods do you support?",
+        "How do I integrate with AWS?",
+        "What are your support hours?",
+        "How do I reset my password?",
+        "Can I download my invoice?",
+        "Which plan includes API access?",
+        "How do I add a team member?",
+        "Where can I find the documentation?",
+        "What is the API rate limit?",
+        "How do I export my data?",
+        "Do you offer annual billing?",
+        "How do I configure webhooks?",
+        "Is there a mobile app?",
+        "What regions are supported?",
+        "How do I change my email address?",
+        "Can I upgrade my plan mid-cycle?",
+        "What file formats can I upload?",
+        "How do I enable two-factor authentication?",
+        "Do you have a status page?",
+        "How long does a refund take?",
+    ],
+    "Negative": [
+        "This is terrible!",
+        "I'm very frustrated",
+        "This doesn't work at all",
+        "I've been waiting for days and nobody has helped me",
+        "Your product is broken again",
+        "I want a refund, this is unacceptable",
+        "Worst customer service I've ever experienced",
+        "I'm extremely disappointed",
+        "I'm furious about this",
+        "Nothing I try works and I'm fed up",
+        "This is a complete waste of money",
+        "I'm angry that my data is gone",
+        "Why is this still not fixed?",
+        "I'm going to cancel if this isn't resolved",
+        "Your app keeps crashing and it's ruining my work",
+        "I'm sick of these outages",
+        "Nobody responds to my tickets",
+        "This is ridiculous",
+        "I regret signing up",
+        "I'm really upset with how this was handled",
+    ],
+}
+
+_centroids: Dict[str, Tuple[List[str], np.ndarray]] = {}
+_lock = threading.Lock()
+
+
+def _build_centroids(seeds: Dict[str, List[str]]) -> Tuple[List[str], np.ndarray]:
+    """Embed the seed phrases and return (labels, L2-normalized centroid matrix)"""
+    labels = list(seeds)
+    phrases = [phrase for label in labels for phrase in seeds[label]]
+    # Embedded the way customer queries are: BGE prefixes queries with an
+    # instruction that documents don't get, OpenAI embeds both identically
+    embeddings = get_embeddings()
+    if isinstance(embeddings, LocalBGEEmbeddings):
+        raw = embeddings.embed_queries(phrases)
+    else:
+        raw = embeddings.embed_documents(phrases)
+    vectors = np.asarray(raw, dtype=np.float32)
+
+    centroids = []
+    start = 0
+    for label in labels:
+        count = len(seeds[label])
+        centroid = vectors[start:start + count].mean(axis=0)
+        centroids.append(centroid / np.linalg.norm(centroid))
+        start += count
+
+    return labels, np.vstack(centroids)
+
+
+def _get_centroids(name: str, seeds: Dict[str, List[str]]) -> Tuple[List[str], np.ndarray]:
+    """Build centroids on first use (one batched embedding call) and keep them in memory"""
+    with _lock:
+        if name not in _centroids:
+            logger.info(f"Building {name} centroids from {sum(map(len, seeds.values()))} seed phrases")
+            _centroids[name] = _build_centroids(seeds)
+        return _centroids[name]
+
+
+def _nearest(ctx: RequestContext, name: str, seeds: Dict[str, List[str]]) -> Optional[str]:
+    """
+    Return the nearest label, or None unless it beats the runner-up by the configured margin
+
+    Absolute similarities are uninformative (any on-topic text scores well
+    against every mean centroid), so confidence is the gap between the top two.
+    """
+    try:
+        labels, centroids = _get_centroids(name, seeds)
+        scores = centroids @ normalize_embedding(ctx.query_embedding)
+    except Exception as e:
+        logger.error(f"Local {name} classification failed: {e}")
+        return None
+
+    runner_up, best = np.argsort(scores)[-2:]
+    margin = float(scores[best] - scores[runner_up])
+    if margin < settings.local_classifier_min_margin:
+        logger.info(f"Local {name} classifier not confident (margin={margin:.3f})")
+        return None
+
+    return labels[int(best)]
+
+
+def classify_category(ctx: RequestContext) -> Optional[str]:
+    """
+    Classify query category locally
+
+    Args:
+        ctx: Request context carrying the query embedding
+
+    Returns:
+        Technical, Billing or General, or None if the LLM should decide
+    """
+    if not settings.local_classifier_enabled:
+        return None
+    return _nearest(ctx, "category", CATEGORY_SEEDS)
+
+
+def classify_sentiment(ctx: RequestContext) -> Optional[str]:
+    """
+    Classify query sentiment locally
+
+    Sentiment decides human escalation, so this is opt-in
+    (LOCAL_CLASSIFIER_SENTIMENT_ENABLED) until evaluate() shows it matches the LLM.
+
+    Args:
+        ctx: Request context carrying the query embedding
+
+    Returns:
+        Positive, Neutral or Negative, or None if the LLM should decide
+    """
+    if not (settings.local_classifier_enabled and settings.local_classifier_sentiment_enabled):
+        return None
+    return _nearest(ctx, "sentiment", SENTIMENT_SEEDS)
+
+
+# Labelled queries for evaluate(): (query, category, sentiment). Deliberately
+# mixes topic and tone (angry billing, happy technical, ...) so sentiment
+# isn't judged on topic alone.
+EVAL_QUERIES: List[Tuple[str, str, str]] = [
+    ("How do I set up SSO for my team?", "Technical", "Neutral"),
+    ("Your API has been down all morning and my customers are furious", "Technical", "Negative"),
+    ("The new SDK release fixed my timeout issue, thank you!", "Technical", "Positive"),
+    ("Webhooks keep failing and nobody answers my tickets. Unacceptable.", "Technical", "Negative"),
+    ("Is there a limit on how many API keys I can create?", "Technical", "Neutral"),
+    ("Which Python versions does the client library support?", "Technical", "Neutral"),
+    ("I was billed twice for March, please fix this immediately, I'm livid", "Billing", "Negative"),
+    ("Can I switch from monthly to annual billing?", "Billing", "Neutral"),
+    ("Thanks for processing my refund so quickly!", "Billing", "Positive"),
+    ("Why did my invoice go up without any warning? This is outrageous.", "Billing", "Negative"),
+    ("Do you offer discounts for nonprofits?", "Billing", "Neutral"),
+    ("Where do I find my past receipts?", "Billing", "Neutral"),
+    ("What time does your support team start on Mondays?", "General", "Neutral"),
+    ("Your support agent Maria was wonderful, please pass on my thanks", "General", "Positive"),
+    ("I've emailed three times this week and still have no reply", "General", "Negative"),
+    ("Do you have an office in Europe?", "General", "Neutral"),
+    ("How can I send feedback about the product?", "General", "Neutral"),
+    ("Honestly the worst company I've dealt with", "General", "Negative"),
+]
+
+
+def evaluate() -> Dict[str, float]:
+    """
+    Score the local classifier on EVAL_QUERIES
+
+    Reports accuracy on the queries it is confident about, how many it is
+    confident about (coverage), and escalation precision/recall, where an
+    escalation is a Negative sentiment. Uncovered queries go to the LLM, so
+    they count as neither a hit nor a miss.
+
+    Returns:
+        Dictionary of metric name to value
+    """
+    metrics: Dict[str, float] = {}
+
+    for name, seeds, column in (("category", CATEGORY_SEEDS, 1), ("sentiment", SENTIMENT_SEEDS, 2)):
+        predictions = [
+            (_nearest(RequestContext(row[0]), name, seeds), row[column])
+            for row in EVAL_QUERIES
+        ]
+        covered = [(predicted, expected) for predicted, expected in predictions if predicted]
+        metrics[f"{name}_coverage"] = len(covered) / len(predictions)
+        metrics[f"{name}_accuracy"] = (
+            sum(predicted == expected for predicted, expected in covered) / len(covered)
+            if covered else 0.0
+        )
+
+        if name == "sentiment":
+            escalated = [expected for predicted, expected in covered if predicted == "Negative"]
+            negatives = [predicted for predicted, expected in covered if expected == "Negative"]
+            metrics["escalation_precision"] = (
+                escalated.count("Negative") / len(escalated) if escalated else 0.0
+            )
+            metrics["escalation_recall"] = (
+                negatives.count("Negative") / len(negatives) if negatives else 0.0
+            )
+
+    return metrics
+
+
+if __name__ == "__main__":
+    # python -m app.agents.classifier_local (needs embedding credentials)
+    for metric, value in evaluate().items():
+        print(f"{metric}: {value:.2f}")
@@ -0,0 +1,43 @@
+"""
+Per-request context shared by the workflow nodes
+Embeds the customer query once so the cache, classifier and retrieval reuse it
+"""
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List
+
+from app.models.schemas import CustomerSupportState
+from app.database.vectordb import get_embeddings
+
+
+@dataclass
+class RequestContext:
+    """Customer query plus its lazily computed embedding"""
+    query: str
+
+    @cached_property
+    def query_embedding(self) -> List[float]:
+        """Query embedding, computed on first access"""
+        return get_embeddings().embed_query(self.query)
+
+    async def aembed(self) -> List[float]:
+        """Compute the embedding without blocking the event loop (no-op if already done)"""
+        if "query_embedding" not in self.__dict__:
+            self.__dict__["query_embedding"] = await get_embeddings().aembed_query(self.query)
+        return self.query_embedding
+
+
+def get_request_context(state: CustomerSupportState) -> RequestContext:
+    """
+    Get the request context from workflow state, creating one if needed
+
+    Args:
+        state: Current workflow state containing customer_query
+
+    Returns:
+        RequestContext for the state's customer_query
+    """
+    ctx = state.get("request_context")
+    if ctx is None or ctx.query != state["customer_query"]:
+        ctx = RequestContext(state["customer_query"])
+    return ctx
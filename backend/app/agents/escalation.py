@@ -9,6 +9,18 @@ from app.models.schemas import CustomerSupportState
 
 logger = logging.getLogger(__name__)
 
+# Static reply for escalated queries; it doesn't depend on category or retrieved docs
+ESCALATION_MESSAGE = (
+    "We sincerely apologize for any frustration or inconvenience you've experienced. "
+    "Your concern is very important to us, and we want to ensure you receive the best possible support. "
+    "\n\n"
+    "A member of our customer success team will reach out to you within the next 2 hours to address "
+    "your issue personally. In the meantime, if you need immediate assistance, please contact us at "
+    "support@company.com or call our priority support line at 1-800-SUPPORT."
+    "\n\n"
+    "Thank you for your patience and for bringing this to our attention."
+)
+
 
 def escalate_to_human(state: CustomerSupportState) -> Dict[str, str]:
     """
@@ -23,17 +35,19 @@ def escalate_to_human(state: CustomerSupportState) -> Dict[str, str]:
     query = state["customer_query"]
     logger.warning(f"Escalating negative sentiment query to human agent: {query[:100]}...")
     
-    escalation_message = (
-        "We sincerely apologize for any frustration or inconvenience you've experienced. "
-        "Your concern is very important to us, and we want to ensure you receive the best possible support. "
-        "\n\n"
-        "A member of our customer success team will reach out to you within the next 2 hours to address "
-        "your issue personally. In the meantime, if you need immediate assistance, please contact us at "
-        "support@company.com or call our priority support line at 1-800-SUPPORT."
-        "\n\n"
-        "Thank you for your patience and for bringing this to our attention."
-    )
-    
     logger.info("Human escalation message generated")
     
-    return {"final_response": escalation_message}
+    return {"final_response": ESCALATION_MESSAGE}
+
+
+async def aescalate_to_human(state: CustomerSupportState) -> Dict[str, str]:
+    """
+    Async variant of escalate_to_human, so the graph runs it on the event loop
+    
+    Args:
+        state: Current workflow state
+        
+    Returns:
+        Dictionary with final_response indicating escalation
+    """
+    return escalate_to_human(state)
@@ -3,105 +3,179 @@ Response generation handlers using RAG
 Generates contextual responses based on knowledge base retrieval
 """
 import logging
-from typing import Dict
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models.schemas import CustomerSupportState
 from app.config.settings import get_settings
+from app.llm.client import get_async_llm
+from app.agents._prompts import TECHNICAL_PROMPT, BILLING_PROMPT, GENERAL_PROMPT, DIRECT_PROMPT
 from app.database.vectordb import search_knowledge_base
+from app.cache import semantic_cache
+from app.agents.context import get_request_context
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-def generate_technical_response(state: CustomerSupportState) -> Dict[str, str]:
+@lru_cache(maxsize=1)
+def _llm() -> ChatOpenAI:
+    """Shared LLM client on the shared HTTP/2 connection pool"""
+    return get_async_llm()
+
+
+# Prompt | LLM chains, compiled once at import
+TECHNICAL_CHAIN = ChatPromptTemplate.from_template(TECHNICAL_PROMPT) | _llm()
+BILLING_CHAIN = ChatPromptTemplate.from_template(BILLING_PROMPT) | _llm()
+GENERAL_CHAIN = ChatPromptTemplate.from_template(GENERAL_PROMPT) | _llm()
+DIRECT_CHAIN = ChatPromptTemplate.from_template(DIRECT_PROMPT) | _llm()
+
+
+# Fallback responses when generation fails
+TECHNICAL_ERROR_MESSAGE = (
+    "I apologize, but I encountered an error while processing your technical question. "
+    "Please contact our technical support team at support@company.com for immediate assistance."
+)
+BILLING_ERROR_MESSAGE = (
+    "I apologize, but I encountered an error while processing your billing question. "
+    "Please contact our billing team at billing@company.com for immediate assistance."
+)
+GENERAL_ERROR_MESSAGE = (
+    "I apologize, but I encountered an error while processing your question. "
+    "Please contact our support team at support@company.com for assistance."
+)
+
+# Prompt filler when retrieval finds nothing
+TECHNICAL_NO_DOCS_MESSAGE = "No specific documentation found for this query."
+BILLING_NO_DOCS_MESSAGE = "No specific billing information found for this query."
+GENERAL_NO_DOCS_MESSAGE = "No specific information found for this query."
+
+
+# Greetings, thanks and sign-offs that the knowledge base can't help answer
+_SMALL_TALK = re.compile(
+    r"^(\W*(hi|hello|hey|good (morning|afternoon|evening)|thanks?|thank you|thx|ok(ay)?|great|cool|"
+    r"awesome|perfect|got it|bye|goodbye|see you|there|team|everyone|so much|a lot|again|that helped)\b)+\W*$",
+    re.IGNORECASE
+)
+_QUESTION_WORDS = re.compile(r"\b(how|what|when|where|why|which|who|can|do|does|is|are)\b", re.IGNORECASE)
+
+
+def _needs_rag(query: str, category: str) -> bool:
     """
-    Generate technical support response using RAG
+    Decide whether a query needs knowledge base context
+    
+    Small talk ("thanks!", "hello") and short General remarks with no
+    question in them are answered directly, without the retrieved
+    documents in the prompt.
+    """
+    if _SMALL_TALK.match(query):
+        return False
+    if category == "General" and len(query) < 40 and "?" not in query and not _QUESTION_WORDS.search(query):
+        return False
+    return True
+
+
+def _prepare_chain(
+    state: CustomerSupportState,
+    kind: str,
+    chain,
+    no_docs_message: str
+) -> Tuple[Any, Dict[str, str]]:
+    """Pick the RAG chain with retrieved content, or the direct chain for small talk"""
+    query = state["customer_query"]
+    category = state["query_category"]
+    
+    if not _needs_rag(query, category):
+        logger.info("Query doesn't need knowledge base context, answering directly")
+        return DIRECT_CHAIN, {"customer_query": query}
+    
+    # Retrieve relevant documents, filtered to this handler's category when it matches
+    relevant_docs = _get_relevant_docs(
+        state,
+        category_filter=kind if category.lower() == kind else None
+    )
+    
+    # Extract content from retrieved documents
+    retrieved_content = _format_docs(relevant_docs) or no_docs_message
+    
+    return chain, {"customer_query": query, "retrieved_content": retrieved_content}
+
+
+def _get_relevant_docs(state: CustomerSupportState, category_filter: str = None) -> List[Document]:
+    """
+    Get knowledge base documents for the query
+    
+    Uses the documents prefetched alongside categorization when available, filtering
+    them by category client-side instead of querying ChromaDB again.
     
     Args:
         state: Current workflow state
+        category_filter: Optional category to filter by (technical, billing, general)
         
     Returns:
-        Dictionary with final_response
+        List of relevant documents
     """
+    prefetched = state.get("retrieved_docs")
+    if prefetched is None:
+        return search_knowledge_base(get_request_context(state), category_filter=category_filter)
+    
+    if category_filter:
+        prefetched = [doc for doc in prefetched if doc.metadata.get("category") == category_filter]
+    
+    return prefetched[:settings.rag_top_k]
+
+
+def _format_docs(relevant_docs: List[Document]) -> str:
+    """Join retrieved documents into the prompt's knowledge base section"""
+    return "\n\n".join([
+        f"[Source: {doc.metadata.get('source', 'Unknown')}]\n{doc.page_content}"
+        for doc in relevant_docs
+    ])
+
+
+async def _agenerate_response(
+    state: CustomerSupportState,
+    kind: str,
+    chain,
+    no_docs_message: str,
+    error_message: str
+) -> Dict[str, str]:
+    """Generate a RAG response for one handler kind (technical, billing, general) without blocking the loop"""
     query = state["customer_query"]
     category = state["query_category"]
     
-    logger.info(f"Generating technical response for: {query[:100]}...")
+    logger.info(f"Generating {kind} response for: {query[:100]}...")
+    
+    # Reuse the answer to a near-identical query if we have one
+    ctx = get_request_context(state)
+    cache_namespace = f"resp:{category}"
+    cached_response = semantic_cache.lookup(ctx, cache_namespace)
+    if cached_response:
+        return {"final_response": cached_response}
     
     try:
-        # Retrieve relevant documents with technical filter
-        relevant_docs = search_knowledge_base(
-            query=query,
-            category_filter="technical" if category.lower() == "technical" else None
-        )
-        
-        # Extract content from retrieved documents
-        retrieved_content = "\n\n".join([
-            f"[Source: {doc.metadata.get('source', 'Unknown')}]\n{doc.page_content}"
-            for doc in relevant_docs
-        ])
-        
-        if not retrieved_content:
-            retrieved_content = "No specific documentation found for this query."
-        
-        # Technical response prompt
-        TECHNICAL_PROMPT = """
-        You are a technical support specialist with deep expertise in our platform.
-        
-        Craft a clear and detailed technical support response for the following customer query.
-        Use the retrieved knowledge base information below to provide accurate, specific guidance.
-        
-        Guidelines:
-        - Be precise and technical but also clear and understandable
-        - Include specific examples, code snippets, or configuration details when relevant
-        - Reference documentation sources when applicable
-        - If the retrieved information doesn't fully answer the question, acknowledge what you know
-          and suggest additional resources or next steps
-        - Keep the response professional and helpful
-        
-        Retrieved Knowledge Base Information:
-        {retrieved_content}
-        
-        Customer Query:
-        {customer_query}
-        
-        Technical Support Response:
-        """
-        
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.llm_temperature,
-            openai_api_key=settings.openai_api_key
-        )
-        
-        # Generate response
-        prompt = ChatPromptTemplate.from_template(TECHNICAL_PROMPT)
-        chain = prompt | llm
-        
-        response = chain.invoke({
-            "customer_query": query,
-            "retrieved_content": retrieved_content
-        })
+        chain, inputs = _prepare_chain(state, kind, chain, no_docs_message)
+        response = await chain.ainvoke(inputs)
         
         final_response = response.content.strip()
-        logger.info("Technical response generated successfully")
+        logger.info(f"{kind.capitalize()} response generated successfully")
+        
+        semantic_cache.store(ctx, cache_namespace, final_response)
         
         return {"final_response": final_response}
         
     except Exception as e:
-        logger.error(f"Error generating technical response: {e}")
-        return {
-            "final_response": "I apologize, but I encountered an error while processing your technical question. "
-                             "Please contact our technical support team at support@company.com for immediate assistance."
-        }
+        logger.error(f"Error generating {kind} response: {e}")
+        return {"final_response": error_message}
 
 
-def generate_billing_response(state: CustomerSupportState) -> Dict[str, str]:
+async def agenerate_technical_response(state: CustomerSupportState) -> Dict[str, str]:
     """
-    Generate billing support response using RAG
+    Generate technical support response using RAG
     
     Args:
         state: Current workflow state
@@ -109,82 +183,31 @@ def generate_billing_response(state: CustomerSupportState) -> Dict[str, str]:
     Returns:
         Dictionary with final_response
     """
-    query = state["customer_query"]
-    category = state["query_category"]
-    
-    logger.info(f"Generating billing response for: {query[:100]}...")
+    return await _agenerate_response(
+        state, "technical", TECHNICAL_CHAIN,
+        TECHNICAL_NO_DOCS_MESSAGE,
+        TECHNICAL_ERROR_MESSAGE
+    )
+
+
+async def agenerate_billing_response(state: CustomerSupportState) -> Dict[str, str]:
+    """
+    Generate billing support response using RAG
     
-    try:
-        # Retrieve relevant documents with billing filter
-        relevant_docs = search_knowledge_base(
-            query=query,
-            category_filter="billing" if category.lower() == "billing" else None
-        )
-        
-        # Extract content from retrieved documents
-        retrieved_content = "\n\n".join([
-            f"[Source: {doc.metadata.get('source', 'Unknown')}]\n{doc.page_content}"
-            for doc in relevant_docs
-        ])
-        
-        if not retrieved_content:
-            retrieved_content = "No specific billing information found for this query."
-        
-        # Billing response prompt
-        BILLING_PROMPT = """
-        You are a billing support specialist focused on helping customers with financial matters.
-        
-        Craft a clear and detailed billing support response for the following customer query.
-        Use the retrieved knowledge base information below to provide accurate answers about pricing,
-        payments, invoices, refunds, or subscription matters.
-        
-        Guidelines:
-        - Be clear about pricing, payment terms, and policies
-        - Include specific details like pricing tiers, payment methods, and timeframes
-        - If discussing refunds or disputes, be empathetic and helpful
-        - Reference official policies when applicable
-        - For account-specific issues, direct the customer to the appropriate channel
-        - Keep the response professional and reassuring
-        
-        Retrieved Knowledge Base Information:
-        {retrieved_content}
-        
-        Customer Query:
-        {customer_query}
-        
-        Billing Support Response:
-        """
-        
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.llm_temperature,
-            openai_api_key=settings.openai_api_key
-        )
-        
-        # Generate response
-        prompt = ChatPromptTemplate.from_template(BILLING_PROMPT)
-        chain = prompt | llm
-        
-        response = chain.invoke({
-            "customer_query": query,
-            "retrieved_content": retrieved_content
-        })
-        
-        final_response = response.content.strip()
-        logger.info("Billing response generated successfully")
-        
-        return {"final_response": final_response}
+    Args:
+        state: Current workflow state
         
-    except Exception as e:
-        logger.error(f"Error generating billing response: {e}")
-        return {
-            "final_response": "I apologize, but I encountered an error while processing your billing question. "
-                             "Please contact our billing team at billing@company.com for immediate assistance."
-        }
+    Returns:
+        Dictionary with final_response
+    """
+    return await _agenerate_response(
+        state, "billing", BILLING_CHAIN,
+        BILLING_NO_DOCS_MESSAGE,
+        BILLING_ERROR_MESSAGE
+    )
 
 
-def generate_general_response(state: CustomerSupportState) -> Dict[str, str]:
+async def agenerate_general_response(state: CustomerSupportState) -> Dict[str, str]:
     """
     Generate general support response using RAG
     
@@ -194,75 +217,130 @@ def generate_general_response(state: CustomerSupportState) -> Dict[str, str]:
     Returns:
         Dictionary with final_response
     """
+    return await _agenerate_response(
+        state, "general", GENERAL_CHAIN,
+        GENERAL_NO_DOCS_MESSAGE,
+        GENERAL_ERROR_MESSAGE
+    )
+
+
+async def tee_stream(
+    chunks: AsyncIterator[str],
+    on_complete: Callable[[str], None]
+) -> AsyncIterator[str]:
+    """
+    Pass chunks through while accumulating them
+    
+    on_complete receives the full text once the stream is exhausted, for
+    consumers that need the final response (logging, cache store).
+    
+    Args:
+        chunks: Source stream of text chunks
+        on_complete: Callback receiving the accumulated text
+        
+    Yields:
+        The source chunks unchanged
+    """
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    on_complete("".join(parts))
+
+
+async def _stream_response(
+    state: CustomerSupportState,
+    kind: str,
+    chain,
+    no_docs_message: str,
+    error_message: str
+) -> AsyncIterator[str]:
+    """Stream a RAG response for one handler kind (technical, billing, general)"""
     query = state["customer_query"]
     category = state["query_category"]
     
-    logger.info(f"Generating general response for: {query[:100]}...")
+    logger.info(f"Streaming {kind} response for: {query[:100]}...")
     
+    # Reuse the answer to a near-identical query if we have one
+    ctx = get_request_context(state)
+    cache_namespace = f"resp:{category}"
+    cached_response = semantic_cache.lookup(ctx, cache_namespace)
+    if cached_response:
+        yield cached_response
+        return
+    
+    def _on_complete(final_response: str) -> None:
+        logger.info(f"{kind.capitalize()} response streamed successfully")
+        semantic_cache.store(ctx, cache_namespace, final_response.strip())
+    
+    started = False
     try:
-        # Retrieve relevant documents with general filter
-        relevant_docs = search_knowledge_base(
-            query=query,
-            category_filter="general" if category.lower() == "general" else None
-        )
-        
-        # Extract content from retrieved documents
-        retrieved_content = "\n\n".join([
-            f"[Source: {doc.metadata.get('source', 'Unknown')}]\n{doc.page_content}"
-            for doc in relevant_docs
-        ])
-        
-        if not retrieved_content:
-            retrieved_content = "No specific information found for this query."
-        
-        # General response prompt
-        GENERAL_PROMPT = """
-        You are a customer support representative helping customers with general inquiries.
-        
-        Craft a clear and helpful response for the following customer query.
-        Use the retrieved knowledge base information below to provide accurate information about
-        our company, policies, support channels, or general questions.
-        
-        Guidelines:
-        - Be friendly, professional, and helpful
-        - Provide complete and accurate information
-        - Include relevant links or contact information when appropriate
-        - If the question is outside your knowledge, direct them to the right resource
-        - Keep the response concise but thorough
-        
-        Retrieved Knowledge Base Information:
-        {retrieved_content}
-        
-        Customer Query:
-        {customer_query}
-        
-        Support Response:
-        """
-        
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.llm_temperature,
-            openai_api_key=settings.openai_api_key
+        chain, inputs = _prepare_chain(state, kind, chain, no_docs_message)
+        tokens = (
+            chunk.content
+            async for chunk in chain.astream(inputs)
+            if chunk.content
         )
         
-        # Generate response
-        prompt = ChatPromptTemplate.from_template(GENERAL_PROMPT)
-        chain = prompt | llm
+        async for token in tee_stream(tokens, _on_complete):
+            started = True
+            yield token
         
-        response = chain.invoke({
-            "customer_query": query,
-            "retrieved_content": retrieved_content
-        })
+    except Exception as e:
+        logger.error(f"Error streaming {kind} response: {e}")
+        # Once partial output has gone out the fallback can't replace it; re-raise
+        # so the endpoint reports an error instead of a cut-off answer marked done
+        if started:
+            raise
+        yield error_message
+
+
+def generate_technical_response_stream(state: CustomerSupportState) -> AsyncIterator[str]:
+    """
+    Stream technical support response using RAG
+    
+    Args:
+        state: Current workflow state
         
-        final_response = response.content.strip()
-        logger.info("General response generated successfully")
+    Returns:
+        Async iterator of response text chunks
+    """
+    return _stream_response(
+        state, "technical", TECHNICAL_CHAIN,
+        TECHNICAL_NO_DOCS_MESSAGE,
+        TECHNICAL_ERROR_MESSAGE
+    )
+
+
+def generate_billing_response_stream(state: CustomerSupportState) -> AsyncIterator[str]:
+    """
+    Stream billing support response using RAG
+    
+    Args:
+        state: Current workflow state
         
-        return {"final_response": final_response}
+    Returns:
+        Async iterator of response text chunks
+    """
+    return _stream_response(
+        state, "billing", BILLING_CHAIN,
+        BILLING_NO_DOCS_MESSAGE,
+        BILLING_ERROR_MESSAGE
+    )
+
+
+def generate_general_response_stream(state: CustomerSupportState) -> AsyncIterator[str]:
+    """
+    Stream general support response using RAG
+    
+    Args:
+        state: Current workflow state
         
-    except Exception as e:
-        logger.error(f"Error generating general response: {e}")
-        return {
-            "final_response": "I apologize, but I encountered an error while processing your question. "
-                             "Please contact our support team at support@company.com for assistance."
-        }
+    Returns:
+        Async iterator of response text chunks
+    """
+    return _stream_response(
+        state, "general", GENERAL_CHAIN,
+        GENERAL_NO_DOCS_MESSAGE,
+        GENERAL_ERROR_MESSAGE
+    )
@@ -2,19 +2,71 @@
 Sentiment analysis agent
 Analyzes customer query sentiment as Positive, Neutral, or Negative
 """
+import asyncio
 import logging
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.models.schemas import CustomerSupportState
 from app.config.settings import get_settings
+from app.llm.client import get_async_llm
+from app.agents._prompts import SENTIMENT_PROMPT
+from app.cache import semantic_cache
+from app.agents.context import RequestContext, get_request_context
+from app.agents.classifier_local import classify_sentiment
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-def analyze_sentiment(state: CustomerSupportState) -> Dict[str, str]:
+@lru_cache(maxsize=1)
+def _llm() -> ChatOpenAI:
+    """Shared small-model LLM client; a single-word label needs neither gpt-4o nor long outputs"""
+    return get_async_llm(model=settings.llm_model_small, max_tokens=5)
+
+
+_VALID_SENTIMENTS = frozenset({"Positive", "Neutral", "Negative"})
+
+
+# Prompt | LLM chains, compiled once at import
+SENTIMENT_CHAIN = ChatPromptTemplate.from_template(SENTIMENT_PROMPT) | _llm()
+
+
+def _known_sentiment(ctx: RequestContext) -> Optional[str]:
+    """Sentiment available without the LLM: a semantically similar cached query, then the local classifier"""
+    # Reuse the sentiment of a semantically similar query if we have one
+    cached_sentiment = semantic_cache.lookup(ctx, "sentiment")
+    if cached_sentiment:
+        logger.info(f"Query sentiment analyzed as: {cached_sentiment} (cached)")
+        return cached_sentiment
+    
+    # Nearest-centroid classification; the LLM only decides low-confidence queries
+    local_sentiment = classify_sentiment(ctx)
+    if local_sentiment:
+        logger.info(f"Query sentiment analyzed as: {local_sentiment} (local)")
+    return local_sentiment
+
+
+def _validate_sentiment(ctx: RequestContext, content: str) -> str:
+    """Validate the LLM's sentiment, caching it if valid"""
+    # Accept "negative", "NEGATIVE." etc. rather than defaulting
+    words = content.split()
+    sentiment = words[0].strip(".*\"'").title() if words else ""
+    
+    # Validate sentiment
+    if sentiment not in _VALID_SENTIMENTS:
+        logger.warning(f"Invalid sentiment '{sentiment}', defaulting to 'Neutral'")
+        sentiment = "Neutral"
+    else:
+        semantic_cache.store(ctx, "sentiment", sentiment)
+    
+    logger.info(f"Query sentiment analyzed as: {sentiment}")
+    return sentiment
+
+
+async def aanalyze_sentiment(state: CustomerSupportState) -> Dict[str, str]:
     """
     Analyze sentiment of customer query
     
@@ -25,57 +77,17 @@ def analyze_sentiment(state: CustomerSupportState) -> Dict[str, str]:
         Dictionary with query_sentiment field
     """
     query = state["customer_query"]
+    ctx = get_request_context(state)
     logger.info(f"Analyzing sentiment for query: {query[:100]}...")
     
-    # Sentiment analysis prompt
-    SENTIMENT_PROMPT = """
-    You are a sentiment analysis expert. Your job is to analyze the emotional tone of customer queries
-    to help prioritize support requests.
-
-    Analyze the customer query below and classify its sentiment into ONE of these categories:
-
-    1. **Positive**: Customer is happy, satisfied, expressing gratitude, or being complimentary.
-       Examples: "Thank you for the great service!", "I love this feature!"
-
-    2. **Neutral**: Customer is asking a straightforward question without strong emotion.
-       Examples: "What payment methods do you support?", "How do I integrate with AWS?"
-
-    3. **Negative**: Customer is frustrated, angry, disappointed, or expressing dissatisfaction.
-       Examples: "This is terrible!", "I'm very frustrated", "This doesn't work at all"
-
-    Return ONLY the sentiment category (Positive, Neutral, or Negative).
-    Do not include any explanation, just the sentiment.
-
-    Customer Query:
-    {customer_query}
-
-    Sentiment:
-    """
+    # Embedding (if not prefetched) and first-use centroid building block, so run off the loop
+    known_sentiment = await asyncio.to_thread(_known_sentiment, ctx)
+    if known_sentiment:
+        return {"query_sentiment": known_sentiment}
     
     try:
-        # Initialize LLM
-        llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.llm_temperature,
-            openai_api_key=settings.openai_api_key
-        )
-        
-        # Create prompt and invoke
-        prompt = ChatPromptTemplate.from_template(SENTIMENT_PROMPT)
-        chain = prompt | llm
-        
-        response = chain.invoke({"customer_query": query})
-        sentiment = response.content.strip()
-        
-        # Validate sentiment
-        valid_sentiments = ["Positive", "Neutral", "Negative"]
-        if sentiment not in valid_sentiments:
-            logger.warning(f"Invalid sentiment '{sentiment}', defaulting to 'Neutral'")
-            sentiment = "Neutral"
-        
-        logger.info(f"Query sentiment analyzed as: {sentiment}")
-        
-        return {"query_sentiment": sentiment}
+        response = await SENTIMENT_CHAIN.ainvoke({"customer_query": query})
+        return {"query_sentiment": _validate_sentiment(ctx, response.content)}
         
     except Exception as e:
         logger.error(f"Error analyzing sentiment: {e}")
@@ -0,0 +1,287 @@
+"""
+Semantic cache for LLM results
+Returns a previously generated value when a new query is close enough in embedding space
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.agents.context import RequestContext
+from app.database.vectordb import compute_ingest_digest
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class _Namespace:
+    """Embedding matrix and cached values for a single namespace, evicted least recently used first"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.vectors: Optional[np.ndarray] = None
+        self.values: List[Any] = []
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        # Unix time each entry was stored, for expiry
+        self.stored_at = np.zeros(capacity, dtype=np.float64)
+        self._clock = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def nearest(self, embedding: np.ndarray):
+        """Return (similarity, index) of the closest unexpired entry, or None if there is none"""
+        count = len(self.values)
+        if not count:
+            return None
+        scores = self.vectors[:count] @ embedding
+        # Expired entries never match, so they go untouched until LRU eviction reclaims them
+        scores[time.time() - self.stored_at[:count] > _ttl_seconds()] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] == -np.inf:
+            return None
+        return float(scores[best]), best
+
+    def touch(self, index: int) -> Any:
+        """Mark an entry as recently used and return its value"""
+        self.last_used[index] = self._tick()
+        return self.values[index]
+
+    def add(self, embedding: np.ndarray, value: Any):
+        """Add an entry, replacing the least recently used one once the namespace is full"""
+        if self.vectors is None:
+            # Allocated once at full capacity, so adding never copies the matrix
+            self.vectors = np.empty((self.capacity, embedding.shape[0]), dtype=np.float32)
+
+        if len(self.values) < self.capacity:
+            index = len(self.values)
+            self.values.append(value)
+        else:
+            index = int(np.argmin(self.last_used))
+            self.values[index] = value
+
+        self.vectors[index] = embedding
+        self.last_used[index] = self._tick()
+        self.stored_at[index] = time.time()
+
+    def fill(self, vectors: np.ndarray, values: List[Any], stored_at: np.ndarray):
+        """Replace the contents with entries ordered least to most recently used, keeping the newest that fit"""
+        vectors, values, stored_at = vectors[-self.capacity:], values[-self.capacity:], stored_at[-self.capacity:]
+        count = len(values)
+        if not count:
+            return
+
+        self.vectors = np.empty((self.capacity, vectors.shape[1]), dtype=np.float32)
+        self.vectors[:count] = vectors
+        self.values = list(values)
+        self.last_used[:count] = np.arange(1, count + 1)
+        self.stored_at[:count] = stored_at
+        self._clock = count
+
+    def export(self) -> Tuple[np.ndarray, List[Any], np.ndarray]:
+        """Vectors, values and store times ordered least to most recently used, for persistence"""
+        order = np.argsort(self.last_used[:len(self.values)], kind="stable")
+        return self.vectors[order], [self.values[i] for i in order], self.stored_at[order]
+
+
+_namespaces: Dict[str, _Namespace] = {}
+_lock = threading.Lock()
+
+# Only whole replies are persisted; per-step labels and responses rebuild quickly
+_PERSISTED_NAMESPACE = "chat"
+
+
+def normalize_embedding(embedding: List[float]) -> np.ndarray:
+    """Convert an embedding to an L2-normalized float32 vector"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _ttl_seconds() -> float:
+    """Maximum age of a cached value"""
+    return settings.semantic_cache_ttl_hours * 3600
+
+
+def _source_tag() -> str:
+    """
+    Identify what persisted replies were generated from
+
+    The ingest digest covers the knowledge base and embedding model; the LLM
+    model is added so changing any of them invalidates the saved replies.
+    """
+    return f"{compute_ingest_digest()}:{settings.llm_model}"
+
+
+def _threshold_for(namespace: str) -> float:
+    """Similarity required for a hit; generated responses need a higher bar"""
+    if namespace == "chat" or namespace.startswith("resp:"):
+        return settings.semantic_cache_response_threshold
+    return settings.semantic_cache_classify_threshold
+
+
+def _has_embedding(ctx: RequestContext) -> bool:
+    """Whether the query is already embedded; reading query_embedding otherwise embeds synchronously"""
+    return "query_embedding" in ctx.__dict__
+
+
+def lookup(ctx: RequestContext, namespace: str) -> Optional[Any]:
+    """
+    Look up a cached value for a semantically similar query
+
+    Skipped if the query hasn't been embedded (e.g. aembed failed), so it never
+    embeds on the caller's thread, which may be the event loop.
+
+    Args:
+        ctx: Request context carrying the query embedding
+        namespace: Cache namespace (e.g. "category", "sentiment", "resp:Billing", "chat")
+
+    Returns:
+        Cached value if a close enough query was seen before, otherwise None
+    """
+    if not settings.semantic_cache_enabled or not _has_embedding(ctx):
+        return None
+
+    try:
+        embedding = normalize_embedding(ctx.query_embedding)
+        with _lock:
+            entries = _namespaces.get(namespace)
+            match = entries.nearest(embedding) if entries else None
+            if match is None or match[0] < _threshold_for(namespace):
+                return None
+            similarity, index = match
+            value = entries.touch(index)
+    except Exception as e:
+        logger.error(f"Semantic cache lookup failed: {e}")
+        return None
+
+    logger.info(f"Semantic cache hit [{namespace}] (similarity={similarity:.3f})")
+    return value
+
+
+async def alookup(ctx: RequestContext, namespace: str) -> Optional[Any]:
+    """
+    Look up a cached value, embedding the query without blocking the event loop
+
+    Args:
+        ctx: Request context for the query
+        namespace: Cache namespace
+
+    Returns:
+        Cached value if a close enough query was seen before, otherwise None
+    """
+    if not settings.semantic_cache_enabled:
+        return None
+
+    try:
+        await ctx.aembed()
+    except Exception as e:
+        logger.error(f"Semantic cache lookup failed: {e}")
+        return None
+
+    return lookup(ctx, namespace)
+
+
+def store(ctx: RequestContext, namespace: str, value: Any) -> None:
+    """
+    Store a value for a query in the given namespace
+
+    Skipped if the query hasn't been embedded, like lookup().
+
+    Args:
+        ctx: Request context carrying the query embedding
+        namespace: Cache namespace
+        value: Validated, JSON-serializable result to return for similar queries
+    """
+    if not settings.semantic_cache_enabled or not _has_embedding(ctx):
+        return
+
+    try:
+        embedding = normalize_embedding(ctx.query_embedding)
+        with _lock:
+            entries = _namespaces.get(namespace)
+            if entries is None:
+                entries = _namespaces[namespace] = _Namespace(settings.semantic_cache_max_entries)
+            entries.add(embedding, value)
+    except Exception as e:
+        logger.error(f"Semantic cache store failed: {e}")
+
+
+def save(path: str) -> None:
+    """
+    Persist the whole-reply ("chat") namespace, tagged with its source (see _source_tag)
+
+    Written to a per-process temporary file and renamed into place, so a
+    crash or another worker saving at the same time never leaves a partial file.
+
+    Args:
+        path: Destination file path (.npz)
+    """
+    if not settings.semantic_cache_enabled:
+        return
+
+    try:
+        with _lock:
+            entries = _namespaces.get(_PERSISTED_NAMESPACE)
+            if not entries:
+                return
+            vectors, values, stored_at = entries.export()
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                source=np.array(_source_tag()),
+                vectors=vectors,
+                values=np.array(json.dumps(values)),
+                stored_at=stored_at
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"Semantic cache saved {len(values)} entries to {path}")
+    except Exception as e:
+        logger.error(f"Semantic cache save failed: {e}")
+
+
+def load(path: str) -> None:
+    """
+    Warm the whole-reply namespace from a file written by save()
+
+    Skipped if the file is missing or its replies came from a different knowledge
+    base, embedding model or LLM. Entries older than the TTL are dropped.
+
+    Args:
+        path: Source file path (.npz)
+    """
+    if not settings.semantic_cache_enabled or not os.path.exists(path):
+        return
+
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if "source" not in data.files or str(data["source"]) != _source_tag():
+                logger.info("Semantic cache file was built from another knowledge base or model, not warming it")
+                return
+            vectors = data["vectors"]
+            values = json.loads(str(data["values"]))
+            stored_at = data["stored_at"]
+
+        fresh = time.time() - stored_at <= _ttl_seconds()
+        vectors, stored_at = vectors[fresh], stored_at[fresh]
+        values = [value for value, keep in zip(values, fresh) if keep]
+
+        # Built in one step rather than entry by entry
+        entries = _Namespace(settings.semantic_cache_max_entries)
+        entries.fill(vectors, values, stored_at)
+        with _lock:
+            _namespaces[_PERSISTED_NAMESPACE] = entries
+        logger.info(f"Semantic cache warmed with {len(entries)} entries from {path}")
+    except Exception as e:
+        logger.error(f"Semantic cache load failed: {e}")
@@ -3,7 +3,7 @@ Application configuration and settings
 """
 import os
 from typing import Optional
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -12,21 +12,51 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str
     llm_model: str = "gpt-4o"
+    llm_model_small: str = "gpt-4o-mini"
     llm_temperature: float = 0.0
     embedding_model: str = "text-embedding-3-small"
     
+    # Embedding Backend ("openai" or "local" ONNX model via fastembed)
+    embedding_backend: str = "openai"
+    local_embedding_model: str = "BAAI/bge-small-en-v1.5"
+    
     # API Configuration
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     api_workers: int = 4
+    worker_threads: int = 100
+    
+    # Vector Database Backend ("chroma" or "qdrant")
+    vectordb_backend: str = "chroma"
+    vectordb_rebuild: bool = False
     
     # ChromaDB Configuration
     chromadb_path: str = "./knowledge_base"
     chromadb_collection: str = "knowledge_base"
+    chromadb_rebuild: bool = False  # Deprecated alias of vectordb_rebuild
+    
+    # Qdrant Configuration (used when vectordb_backend is "qdrant")
+    qdrant_url: Optional[str] = None
+    qdrant_api_key: Optional[str] = None
+    qdrant_path: str = "./qdrant_data"
     
     # RAG Configuration
     rag_top_k: int = 3
     rag_score_threshold: float = 0.2
+    rag_prefetch_k: int = 9
+    
+    # Semantic Cache Configuration
+    semantic_cache_enabled: bool = True
+    semantic_cache_classify_threshold: float = 0.92
+    semantic_cache_response_threshold: float = 0.97
+    semantic_cache_max_entries: int = 1000
+    semantic_cache_ttl_hours: int = 24
+    semantic_cache_path: str = "./semantic_cache.npz"
+    
+    # Local Classifier Configuration
+    local_classifier_enabled: bool = True
+    local_classifier_sentiment_enabled: bool = False
+    local_classifier_min_margin: float = 0.05
     
     # Application Settings
     max_query_length: int = 500
@@ -40,9 +70,13 @@ class Settings(BaseSettings):
     # Security
     allowed_origins: str = "http://localhost:8000,http://localhost:3000"
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    # Frozen: settings are read-only after startup
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True,
+        extra="ignore"
+    )
 
 
 # Global settings instance
@@ -1,32 +1,142 @@
 """
-ChromaDB vector database initialization and management
+Vector database (ChromaDB, or Qdrant via VECTORDB_BACKEND) initialization and management
 """
+import asyncio
+import hashlib
 import json
 import os
 import logging
-from typing import List
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Tuple
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain.docstore.document import Document
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 
 from app.config.settings import get_settings
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock; run a single worker there
+    fcntl = None
+
+if TYPE_CHECKING:
+    from app.agents.context import RequestContext
+
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Global retriever instance
+# Global vector store and retriever instances
+_vectordb: VectorStore = None
 _retriever: VectorStoreRetriever = None
 
+# Set once the stores are built; the lock makes concurrent first calls initialize only once
+_INITIALIZED = False
+_init_lock = threading.Lock()
+
+# Marker file recording which knowledge base the persisted collection was built from
+DIGEST_FILENAME = ".ingest_digest"
+# Lock file serializing the digest check and ingest across worker processes
+LOCK_FILENAME = ".ingest.lock"
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> Embeddings:
+    """Shared embedding client for ingest, retrieval, semantic cache and local classifier"""
+    if settings.embedding_backend == "local":
+        from app.embeddings.local_bge import LocalBGEEmbeddings
+        return LocalBGEEmbeddings(model_name=settings.local_embedding_model)
+    
+    # Pack up to 256 texts per embeddings request at ingest (default is 16)
+    return OpenAIEmbeddings(
+        model=settings.embedding_model,
+        openai_api_key=settings.openai_api_key,
+        chunk_size=256,
+        max_retries=3,
+        request_timeout=30
+    )
+
+
+def get_embedding_model_id() -> str:
+    """Identifier of the active embedding model, so a model switch forces re-ingest"""
+    if settings.embedding_backend == "local":
+        return f"local:{settings.local_embedding_model}"
+    return settings.embedding_model
+
+
+def get_knowledge_base_path() -> str:
+    """Get the absolute path to the knowledge base JSON file"""
+    # __file__ is at backend/app/database/vectordb.py
+    # We need to go up 3 levels to get to project root, then down to backend/data
+    current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(current_dir, "data", "router_agent_documents.json")
+
+
+def compute_ingest_digest() -> str:
+    """
+    Fingerprint the knowledge base file, embedding model and collection name
+    
+    The persisted collection is only reused when this matches the digest
+    written at ingest time, so renaming the collection re-ingests into the
+    new one instead of opening it empty.
+    """
+    digest = hashlib.sha256()
+    with open(get_knowledge_base_path(), "rb") as f:
+        digest.update(f.read())
+    digest.update(get_embedding_model_id().encode("utf-8"))
+    digest.update(settings.vectordb_backend.encode("utf-8"))
+    digest.update(settings.chromadb_collection.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _digest_dir() -> str:
+    """Directory holding the ingest digest for the active backend"""
+    if settings.vectordb_backend == "qdrant":
+        return settings.qdrant_path
+    return settings.chromadb_path
+
+
+def _read_stored_digest() -> str:
+    """Read the digest of the last ingest, or an empty string if there is none"""
+    digest_path = os.path.join(_digest_dir(), DIGEST_FILENAME)
+    if not os.path.exists(digest_path):
+        return ""
+    with open(digest_path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def _write_stored_digest(digest: str) -> None:
+    """Record the digest of a completed ingest"""
+    os.makedirs(_digest_dir(), exist_ok=True)
+    with open(os.path.join(_digest_dir(), DIGEST_FILENAME), "w", encoding="utf-8") as f:
+        f.write(digest)
+
+
+@contextmanager
+def _ingest_lock():
+    """Hold an exclusive lock on the local store directory while checking the digest and ingesting"""
+    if fcntl is None or _is_shared_store():
+        yield
+        return
+    
+    os.makedirs(_digest_dir(), exist_ok=True)
+    with open(os.path.join(_digest_dir(), LOCK_FILENAME), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 
 def load_knowledge_base() -> List[Document]:
     """Load knowledge base documents from JSON file"""
     try:
-        # Get the absolute path to the data file
-        # __file__ is at backend/app/database/vectordb.py
-        # We need to go up 3 levels to get to project root, then down to backend/data
-        current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        data_path = os.path.join(current_dir, "data", "router_agent_documents.json")
+        data_path = get_knowledge_base_path()
         
         logger.info(f"Loading knowledge base from: {data_path}")
         
@@ -54,33 +164,68 @@ def load_knowledge_base() -> List[Document]:
 
 def initialize_vectordb() -> VectorStoreRetriever:
     """
-    Initialize ChromaDB vector store and return retriever
+    Initialize vector store and return retriever
+    
+    Idempotent: once initialized, later calls return the existing retriever.
     """
-    global _retriever
+    global _retriever, _INITIALIZED
+    
+    if _INITIALIZED:
+        return _retriever
+    
+    with _init_lock:
+        if _INITIALIZED:
+            return _retriever
+        
+        started = time.perf_counter()
+        _retriever = _build_vectordb()
+        _INITIALIZED = True
+        logger.info(f"Vector store initialized in {time.perf_counter() - started:.2f}s")
+        return _retriever
+
+
+def _build_vectordb() -> VectorStoreRetriever:
+    """Open or ingest the knowledge base collection, set _vectordb and return its retriever"""
+    global _vectordb
     
     try:
-        logger.info("Initializing ChromaDB vector store...")
+        logger.info(f"Initializing vector store (backend: {settings.vectordb_backend})...")
         
-        # Load documents
+        # Initialize embeddings
+        embeddings = get_embeddings()
+        
+        # Load documents (local JSON read; embedding only happens on ingest)
         documents = load_knowledge_base()
         
-        # Initialize embeddings
-        embeddings = OpenAIEmbeddings(
-            model=settings.embedding_model,
-            openai_api_key=settings.openai_api_key
-        )
+        # Workers share the persist directory: one ingests while the others wait,
+        # then find the fresh digest and just open the collection
+        with _ingest_lock():
+            digest = compute_ingest_digest()
+            rebuild = settings.vectordb_rebuild or settings.chromadb_rebuild
+            if _is_shared_store():
+                # Other replicas may be serving the remote collection and there is no
+                # local digest to compare against, so only an explicit rebuild replaces it
+                reuse_persisted = not rebuild
+            else:
+                reuse_persisted = not rebuild and _read_stored_digest() == digest
+            
+            if reuse_persisted:
+                # Knowledge base unchanged: open the persisted collection, no embedding calls
+                logger.info("Loading persisted collection (knowledge base unchanged)")
+            else:
+                logger.info("Knowledge base changed or rebuild requested, re-ingesting documents...")
+            
+            open_store = _open_qdrant if settings.vectordb_backend == "qdrant" else _open_chroma
+            
+            vectordb = open_store(settings.chromadb_collection, documents, embeddings, reuse_persisted)
+            
+            if not reuse_persisted and not _is_shared_store():
+                _write_stored_digest(digest)
         
-        # Create or load vector store
-        vectordb = Chroma.from_documents(
-            documents=documents,
-            collection_name=settings.chromadb_collection,
-            embedding=embeddings,
-            collection_metadata={"hnsw:space": "cosine"},
-            persist_directory=settings.chromadb_path
-        )
+        _vectordb = vectordb
         
         # Create retriever with similarity score threshold
-        _retriever = vectordb.as_retriever(
+        retriever = vectordb.as_retriever(
             search_type="similarity_score_threshold",
             search_kwargs={
                 "k": settings.rag_top_k,
@@ -88,54 +233,218 @@ def initialize_vectordb() -> VectorStoreRetriever:
             }
         )
         
-        logger.info("ChromaDB vector store initialized successfully")
-        return _retriever
+        logger.info("Vector store initialized successfully")
+        return retriever
         
     except Exception as e:
         logger.error(f"Error initializing vector store: {e}")
         raise
 
 
+def _open_chroma(
+    collection_name: str,
+    docs: List[Document],
+    embeddings: Embeddings,
+    reuse_persisted: bool
+) -> Chroma:
+    """Open a persisted ChromaDB collection, or rebuild it from docs"""
+    if reuse_persisted:
+        return Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            collection_metadata={"hnsw:space": "cosine"},
+            persist_directory=settings.chromadb_path
+        )
+    
+    # Drop the stale collection so documents aren't added twice
+    Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings,
+        persist_directory=settings.chromadb_path
+    ).delete_collection()
+    
+    return Chroma.from_documents(
+        documents=docs,
+        collection_name=collection_name,
+        embedding=embeddings,
+        collection_metadata={"hnsw:space": "cosine"},
+        persist_directory=settings.chromadb_path
+    )
+
+
+def _is_shared_store() -> bool:
+    """Whether the vector store lives on a remote server shared with other replicas"""
+    return settings.vectordb_backend == "qdrant" and bool(settings.qdrant_url)
+
+
+@lru_cache(maxsize=1)
+def _get_qdrant_client():
+    """Qdrant client: remote server if QDRANT_URL is set, otherwise local on-disk storage"""
+    from qdrant_client import QdrantClient
+    
+    if settings.qdrant_url:
+        return QdrantClient(url=settings.qdrant_url, api_key=settings.qdrant_api_key)
+    
+    logger.warning(
+        "QDRANT_URL not set: using embedded Qdrant at QDRANT_PATH, which is single-worker/dev-only "
+        "(the folder is locked by one process and the embedded store ignores quantization)"
+    )
+    return QdrantClient(path=settings.qdrant_path)
+
+
+def _open_qdrant(
+    collection_name: str,
+    docs: List[Document],
+    embeddings: Embeddings,
+    reuse_persisted: bool
+) -> VectorStore:
+    """Open an existing Qdrant collection, or rebuild it from docs with int8 scalar quantization"""
+    # Optional dependency, only needed for VECTORDB_BACKEND=qdrant
+    from langchain_qdrant import QdrantVectorStore
+    from qdrant_client.models import (
+        Distance,
+        PointStruct,
+        ScalarQuantization,
+        ScalarQuantizationConfig,
+        ScalarType,
+        VectorParams,
+    )
+    
+    client = _get_qdrant_client()
+    
+    if not (reuse_persisted and client.collection_exists(collection_name)):
+        # Embed once up front: the vectors give the collection's dimension too
+        vectors = embeddings.embed_documents([doc.page_content for doc in docs])
+        
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+        
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(size=len(vectors[0]), distance=Distance.COSINE),
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+            )
+        )
+        # Same payload layout QdrantVectorStore.add_documents writes
+        client.upsert(
+            collection_name=collection_name,
+            points=[
+                PointStruct(
+                    id=i,
+                    vector=vector,
+                    payload={
+                        QdrantVectorStore.CONTENT_KEY: doc.page_content,
+                        QdrantVectorStore.METADATA_KEY: doc.metadata
+                    }
+                )
+                for i, (doc, vector) in enumerate(zip(docs, vectors))
+            ]
+        )
+    
+    return QdrantVectorStore(client=client, collection_name=collection_name, embedding=embeddings)
+
+
+def _similarity_search_by_vector(
+    vectordb: VectorStore,
+    embedding: List[float],
+    k: int,
+    category: str = None
+) -> List[Tuple[Document, float]]:
+    """Search by embedding, optionally within one category, and return (document, relevance) pairs"""
+    if isinstance(vectordb, Chroma):
+        # Chroma returns cosine distances here; convert to relevance like its text search does
+        results = vectordb.similarity_search_by_vector_with_relevance_scores(
+            embedding,
+            k=k,
+            filter={"category": category} if category else None
+        )
+        return [(doc, 1.0 - distance) for doc, distance in results]
+    
+    qdrant_filter = None
+    if category:
+        from qdrant_client.models import FieldCondition, Filter, MatchValue
+        qdrant_filter = Filter(must=[FieldCondition(key="metadata.category", match=MatchValue(value=category))])
+    
+    # Qdrant scores cosine collections by similarity already
+    return vectordb.similarity_search_with_score_by_vector(embedding, k=k, filter=qdrant_filter)
+
+
 def get_retriever() -> VectorStoreRetriever:
     """Get the global retriever instance"""
-    global _retriever
-    
     if _retriever is None:
         logger.info("Retriever not initialized, initializing now...")
-        _retriever = initialize_vectordb()
+        initialize_vectordb()
     
     return _retriever
 
 
+def get_vectordb() -> VectorStore:
+    """Get the global vector store instance"""
+    if _vectordb is None:
+        logger.info("Vector store not initialized, initializing now...")
+        initialize_vectordb()
+    
+    return _vectordb
+
+
 def search_knowledge_base(
-    query: str,
+    ctx: "RequestContext",
     category_filter: str = None,
     top_k: int = None
 ) -> List[Document]:
     """
     Search knowledge base with optional category filtering
     
+    Searches by the request's precomputed query embedding so the query isn't
+    embedded again.
+    
     Args:
-        query: Search query text
+        ctx: Request context carrying the query and its embedding
         category_filter: Optional category to filter by (technical, billing, general)
         top_k: Number of results to return (default from settings)
     
     Returns:
         List of relevant documents
     """
-    retriever = get_retriever()
+    vectordb = get_vectordb()
     
-    # Update search kwargs if needed
-    if category_filter:
-        retriever.search_kwargs["filter"] = {"category": category_filter.lower()}
+    try:
+        results = _similarity_search_by_vector(
+            vectordb,
+            ctx.query_embedding,
+            k=top_k or settings.rag_top_k,
+            category=category_filter.lower() if category_filter else None
+        )
+        docs = [doc for doc, score in results if score >= settings.rag_score_threshold]
+        logger.info(f"Retrieved {len(docs)} documents for query: {ctx.query[:50]}...")
+        return docs
+    except Exception as e:
+        logger.error(f"Error searching knowledge base: {e}")
+        return []
+
+
+async def asearch_knowledge_base(
+    ctx: "RequestContext",
+    category_filter: str = None,
+    top_k: int = None
+) -> List[Document]:
+    """
+    Async variant of search_knowledge_base
     
-    if top_k:
-        retriever.search_kwargs["k"] = top_k
+    Args:
+        ctx: Request context carrying the query and its embedding
+        category_filter: Optional category to filter by (technical, billing, general)
+        top_k: Number of results to return (default from settings)
     
+    Returns:
+        List of relevant documents
+    """
     try:
-        results = retriever.invoke(query)
-        logger.info(f"Retrieved {len(results)} documents for query: {query[:50]}...")
-        return results
+        await ctx.aembed()
     except Exception as e:
-        logger.error(f"Error searching knowledge base: {e}")
+        logger.error(f"Error embedding query for knowledge base search: {e}")
         return []
+    
+    # Neither backend's by-vector search is natively async; keep it off the event loop
+    return await asyncio.to_thread(search_knowledge_base, ctx, category_filter, top_k)
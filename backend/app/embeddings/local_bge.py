@@ -0,0 +1,37 @@
+"""
+Local ONNX embeddings
+Runs BAAI/bge-small-en-v1.5 on CPU via fastembed instead of calling the OpenAI embeddings API
+"""
+import logging
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "BAAI/bge-small-en-v1.5"
+
+
+class LocalBGEEmbeddings(Embeddings):
+    """LangChain Embeddings backed by a quantized ONNX model running in-process"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64):
+        # Optional dependency, only needed for EMBEDDING_BACKEND=local
+        from fastembed import TextEmbedding
+
+        logger.info(f"Loading local embedding model: {model_name}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = TextEmbedding(model_name=model_name, providers=["CPUExecutionProvider"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of documents"""
+        return [vector.tolist() for vector in self._model.embed(texts, batch_size=self.batch_size)]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of queries (with the query instruction prefix)"""
+        return [vector.tolist() for vector in self._model.query_embed(texts, batch_size=self.batch_size)]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query (BGE adds its query instruction prefix here)"""
+        return next(iter(self._model.query_embed(text))).tolist()
@@ -0,0 +1,55 @@
+"""
+Shared LLM client
+All agents' async LLM calls go through one HTTP/2 connection pool
+"""
+import logging
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bound once at import instead of read from the settings model per call
+_MODEL = settings.llm_model
+_TEMP = settings.llm_temperature
+_KEY = settings.openai_api_key
+
+
+# HTTP/2 multiplexes concurrent classifier/sentiment/handler calls over a few
+# TLS connections; the larger keepalive pool avoids reconnecting under bursts
+_shared_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=30
+)
+
+
+def get_async_llm(**overrides) -> ChatOpenAI:
+    """
+    Build a ChatOpenAI whose async calls use the shared HTTP/2 client
+
+    Args:
+        **overrides: ChatOpenAI arguments replacing the defaults (model, model_kwargs, ...)
+
+    Returns:
+        ChatOpenAI instance
+    """
+    params = {
+        "model": _MODEL,
+        "temperature": _TEMP,
+        "openai_api_key": _KEY,
+        "max_retries": 2,
+        "timeout": 30,
+        "http_async_client": _shared_http,
+    }
+    params.update(overrides)
+    return ChatOpenAI(**params)
+
+
+async def aclose_http_client() -> None:
+    """Close the shared HTTP client (application shutdown)"""
+    await _shared_http.aclose()
+    logger.info("Shared LLM HTTP client closed")
@@ -2,33 +2,71 @@
 FastAPI application for Customer Support Agent
 Main entry point for the API server
 """
+import asyncio
 import logging
-import uuid
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from contextlib import asynccontextmanager
 
+import anyio.to_thread
+import orjson
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 import uvicorn
 
 from app.models.schemas import ChatRequest, ChatResponse, HealthResponse, ErrorResponse
-from app.workflows.support_graph import compiled_support_agent
+from app.workflows.support_graph import compiled_support_agent, astream_final
 from app.database.vectordb import initialize_vectordb, get_retriever
 from app.config.settings import get_settings
+from app.llm.client import aclose_http_client
+from app.agents.context import RequestContext
+from app.agents.handlers import TECHNICAL_ERROR_MESSAGE, BILLING_ERROR_MESSAGE, GENERAL_ERROR_MESSAGE
+from app.cache import semantic_cache
+from app.utils import idgen
 
 # Configure logging
+# Records are written directly (scripts, Lambda, a TestClient without its
+# lifespan) until the server lifespan switches to the queue: from then on
+# request handlers only enqueue records and the listener thread writes them,
+# so file I/O never blocks the event loop.
+_log_handlers = [
+    logging.FileHandler('agent.log'),
+    logging.StreamHandler()
+]
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('agent.log'),
-        logging.StreamHandler()
-    ]
+    handlers=_log_handlers
 )
 logger = logging.getLogger(__name__)
 
+_log_queue = queue.SimpleQueue()
+_queue_handler = QueueHandler(_log_queue)
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+
+
+def _start_queue_logging() -> None:
+    """Route log records through the listener thread"""
+    root = logging.getLogger()
+    for handler in _log_handlers:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    _log_listener.start()
+
+
+def _stop_queue_logging() -> None:
+    """Flush queued records and go back to writing them directly"""
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    _log_listener.stop()
+    for handler in _log_handlers:
+        root.addHandler(handler)
+
 settings = get_settings()
 
 
@@ -38,7 +76,16 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for startup and shutdown events
     """
     # Startup
+    _start_queue_logging()
     logger.info("Starting Customer Support Agent API...")
+    
+    # Size the thread pools for concurrent requests: anyio's limiter covers
+    # Starlette's threadpool, the default executor covers asyncio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.worker_threads
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.worker_threads)
+    )
+    
     try:
         # Initialize vector database
         initialize_vectordb()
@@ -47,10 +94,18 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize vector database: {e}")
         raise
     
+    # Warm the semantic cache with answers from the previous run
+    await asyncio.to_thread(semantic_cache.load, settings.semantic_cache_path)
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Customer Support Agent API...")
+    await asyncio.to_thread(semantic_cache.save, settings.semantic_cache_path)
+    await aclose_http_client()
+    
+    # Flush queued log records before exit
+    _stop_queue_logging()
 
 
 # Initialize FastAPI app
@@ -58,7 +113,8 @@ app = FastAPI(
     title="Customer Support Agent API",
     description="AI-powered customer support system with LangGraph workflow orchestration",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -78,14 +134,70 @@ if os.path.exists(frontend_path):
     app.mount("/static", StaticFiles(directory=os.path.join(frontend_path, "static")), name="static")
     logger.info(f"Mounted static files from: {frontend_path}")
 
+# Resolved once at import; the frontend is static
+_FRONTEND_INDEX = os.path.join(frontend_path, "index.html")
+if not os.path.exists(_FRONTEND_INDEX):
+    _FRONTEND_INDEX = None
+
+
+# Validation limits and error messages, built once instead of per request
+# (exceptions themselves are raised fresh: a shared instance would keep
+# accumulating every raise's traceback frames)
+_MAX_QLEN = settings.max_query_length
+_TOO_LONG_DETAIL = f"Query too long. Maximum length is {_MAX_QLEN} characters."
+_EMPTY_DETAIL = "Query cannot be empty."
+_TOO_LONG_MSG = orjson.dumps({"error": _TOO_LONG_DETAIL}).decode()
+_EMPTY_MSG = orjson.dumps({"error": _EMPTY_DETAIL}).decode()
 
-@app.get("/", response_class=FileResponse)
-async def serve_frontend():
-    """Serve the frontend HTML page"""
-    frontend_index = os.path.join(frontend_path, "index.html")
-    if os.path.exists(frontend_index):
-        return FileResponse(frontend_index)
-    return {"message": "Frontend not found. Access API docs at /docs"}
+# Fallback replies are never cached as answers
+_UNCACHEABLE_RESPONSES = frozenset({TECHNICAL_ERROR_MESSAGE, BILLING_ERROR_MESSAGE, GENERAL_ERROR_MESSAGE})
+
+
+async def _answer_query(query: str, session_id: str) -> dict:
+    """
+    Answer a query from the whole-response semantic cache, or run the workflow and cache its answer
+    
+    Args:
+        query: Validated customer query
+        session_id: Session identifier used as the workflow thread id
+        
+    Returns:
+        Dictionary with response, category and sentiment fields
+    """
+    # Embedded once here; the workflow reuses the same context
+    ctx = RequestContext(query)
+    cached = await semantic_cache.alookup(ctx, "chat")
+    if cached:
+        logger.info(f"Answered from semantic cache - Session: {session_id}")
+        return cached
+    
+    result = await compiled_support_agent.ainvoke(
+        {"customer_query": query, "request_context": ctx},
+        {"configurable": {"thread_id": session_id}}
+    )
+    
+    reply = {
+        "response": result.get("final_response", "I apologize, but I couldn't generate a response."),
+        "category": result.get("query_category", "General"),
+        "sentiment": result.get("query_sentiment", "Neutral")
+    }
+    if "final_response" in result and reply["response"] not in _UNCACHEABLE_RESPONSES:
+        semantic_cache.store(ctx, "chat", reply)
+    
+    return reply
+
+
+# Only registered when the frontend exists
+if _FRONTEND_INDEX:
+    @app.get("/", response_class=FileResponse)
+    async def serve_frontend():
+        """Serve the frontend HTML page"""
+        return FileResponse(_FRONTEND_INDEX)
+
+
+# Last vector DB status as (monotonic time, status); probes within the TTL reuse it
+_HEALTH_TTL_SECONDS = 2.0
+_last_health = (float("-inf"), "unknown")
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -96,19 +208,27 @@ async def health_check():
     Returns:
         Health status of the service and its dependencies
     """
-    try:
-        # Check if retriever is accessible
-        retriever = get_retriever()
-        vectordb_status = "connected" if retriever else "disconnected"
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        vectordb_status = "error"
+    global _last_health
     
-    return HealthResponse(
-        status="healthy" if vectordb_status == "connected" else "unhealthy",
-        vectordb=vectordb_status,
-        timestamp=datetime.now()
-    )
+    checked_at, vectordb_status = _last_health
+    now = time.monotonic()
+    if now - checked_at >= _HEALTH_TTL_SECONDS:
+        try:
+            # Check if retriever is accessible
+            retriever = get_retriever()
+            vectordb_status = "connected" if retriever else "disconnected"
+        except Exception as e:
+            logger.error(f"Health check failed: {e}")
+            vectordb_status = "error"
+        _last_health = (now, vectordb_status)
+    
+    # Returning the response directly skips FastAPI's response_model
+    # validation; the model still documents the schema
+    return ORJSONResponse({
+        "status": "healthy" if vectordb_status == "connected" else "unhealthy",
+        "vectordb": vectordb_status,
+        "timestamp": datetime.now()
+    })
 
 
 @app.post("/api/chat", response_model=ChatResponse)
@@ -127,37 +247,27 @@ async def chat_endpoint(request: ChatRequest):
     """
     try:
         # Generate or use provided session ID
-        session_id = request.session_id or str(uuid.uuid4())
+        session_id = request.session_id or idgen.new_session_id()
         
         logger.info(f"Processing chat request - Session: {session_id}, Query: {request.query[:100]}...")
         
         # Validate query length
-        if len(request.query) > settings.max_query_length:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Query too long. Maximum length is {settings.max_query_length} characters."
-            )
+        if len(request.query) > _MAX_QLEN:
+            raise HTTPException(status_code=400, detail=_TOO_LONG_DETAIL)
         
         if not request.query.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Query cannot be empty."
-            )
+            raise HTTPException(status_code=400, detail=_EMPTY_DETAIL)
         
-        # Run the support agent workflow
-        result = compiled_support_agent.invoke(
-            {"customer_query": request.query},
-            {"configurable": {"thread_id": session_id}}
-        )
+        # Run the support agent workflow (or reuse a cached answer)
+        reply = await _answer_query(request.query, session_id)
         
-        # Extract response data
-        response = ChatResponse(
-            response=result.get("final_response", "I apologize, but I couldn't generate a response."),
-            category=result.get("query_category", "General"),
-            sentiment=result.get("query_sentiment", "Neutral"),
-            session_id=session_id,
-            timestamp=datetime.now()
-        )
+        # Trusted workflow output: returning the response directly skips
+        # FastAPI's response_model validation; the model still documents the schema
+        response = ORJSONResponse({
+            **reply,
+            "session_id": session_id,
+            "timestamp": datetime.now()
+        })
         
         logger.info(f"Chat request processed successfully - Session: {session_id}")
         return response
@@ -172,6 +282,49 @@ async def chat_endpoint(request: ChatRequest):
         )
 
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Process a customer support query and stream the response
+    
+    Emits Server-Sent Events: one {"token": ...} event per response chunk,
+    then a final {"done": true, "session_id": ...} event.
+    
+    Args:
+        request: Chat request containing query and optional session_id
+        
+    Returns:
+        text/event-stream response
+        
+    Raises:
+        HTTPException: If the query is invalid
+    """
+    # Generate or use provided session ID
+    session_id = request.session_id or idgen.new_session_id()
+    
+    logger.info(f"Processing streaming chat request - Session: {session_id}, Query: {request.query[:100]}...")
+    
+    # Validate query length
+    if len(request.query) > _MAX_QLEN:
+        raise HTTPException(status_code=400, detail=_TOO_LONG_DETAIL)
+    
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail=_EMPTY_DETAIL)
+    
+    async def event_stream():
+        try:
+            async for chunk in astream_final(request.query, session_id):
+                yield f"data: {orjson.dumps({'token': chunk}).decode()}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}", exc_info=True)
+            yield f"data: {orjson.dumps({'error': f'Error processing your request: {str(e)}'}).decode()}\n\n"
+        
+        yield f"data: {orjson.dumps({'done': True, 'session_id': session_id}).decode()}\n\n"
+        logger.info(f"Streaming chat request completed - Session: {session_id}")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
     """
@@ -180,53 +333,56 @@ async def websocket_chat(websocket: WebSocket):
     Accepts WebSocket connections and processes messages in real-time
     """
     await websocket.accept()
-    session_id = str(uuid.uuid4())
+    session_id = idgen.new_session_id()
     logger.info(f"WebSocket connection established - Session: {session_id}")
     
+    # Bound once per connection rather than looked up per message; payloads are
+    # serialized with orjson but still sent as text frames
+    send_text = websocket.send_text
+    
+    # Reply template reused for every message; only the per-message fields change
+    reply = {
+        "response": "",
+        "category": "",
+        "sentiment": "",
+        "session_id": session_id,
+        "timestamp": None
+    }
+    
     try:
-        while True:
-            # Receive message from client
-            data = await websocket.receive_text()
+        # iter_text ends cleanly when the client disconnects
+        async for data in websocket.iter_text():
             logger.info(f"WebSocket message received - Session: {session_id}, Query: {data[:100]}...")
             
             try:
                 # Validate query
-                if len(data) > settings.max_query_length:
-                    await websocket.send_json({
-                        "error": f"Query too long. Maximum length is {settings.max_query_length} characters."
-                    })
+                if len(data) > _MAX_QLEN:
+                    await send_text(_TOO_LONG_MSG)
                     continue
                 
                 if not data.strip():
-                    await websocket.send_json({
-                        "error": "Query cannot be empty."
-                    })
+                    await send_text(_EMPTY_MSG)
                     continue
                 
-                # Run support agent
-                result = compiled_support_agent.invoke(
-                    {"customer_query": data},
-                    {"configurable": {"thread_id": session_id}}
-                )
+                # Run support agent (or reuse a cached answer)
+                reply.update(await _answer_query(data, session_id))
+                reply["timestamp"] = datetime.now()
                 
                 # Send response
-                await websocket.send_json({
-                    "response": result.get("final_response", "I apologize, but I couldn't generate a response."),
-                    "category": result.get("query_category", "General"),
-                    "sentiment": result.get("query_sentiment", "Neutral"),
-                    "session_id": session_id,
-                    "timestamp": datetime.now().isoformat()
-                })
+                await send_text(orjson.dumps(reply).decode())
                 
                 logger.info(f"WebSocket response sent - Session: {session_id}")
                 
             except Exception as e:
                 logger.error(f"Error processing WebSocket message: {e}", exc_info=True)
-                await websocket.send_json({
+                await send_text(orjson.dumps({
                     "error": f"Error processing your request: {str(e)}"
-                })
-                
+                }).decode())
+        
+        logger.info(f"WebSocket disconnected - Session: {session_id}")
+        
     except WebSocketDisconnect:
+        # Raised if the client goes away while a reply is being sent
         logger.info(f"WebSocket disconnected - Session: {session_id}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
@@ -250,11 +406,21 @@ async def status():
 
 
 if __name__ == "__main__":
+    # uvloop isn't available on Windows; fall back to the default asyncio loop there
+    try:
+        import uvloop
+        uvloop.install()
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    
     # Run the application
     uvicorn.run(
         "app.main:app",
         host=settings.api_host,
         port=settings.api_port,
         reload=True,
+        loop=loop,
+        http="httptools",
         log_level=settings.log_level.lower()
     )
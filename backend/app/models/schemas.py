@@ -1,7 +1,7 @@
 """
 Pydantic models for request/response validation
 """
-from typing import Optional, TypedDict, Literal
+from typing import Any, List, Optional, TypedDict, Literal
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -80,4 +80,6 @@ class CustomerSupportState(TypedDict):
     customer_query: str
     query_category: str
     query_sentiment: str
+    retrieved_docs: List[Any]
+    request_context: Any
     final_response: str
@@ -0,0 +1,43 @@
+"""
+Session ID generation
+Hands out random 128-bit hex IDs from a buffer refilled with one urandom call per 256 IDs
+"""
+import os
+import threading
+
+_ID_BYTES = 16
+_REFILL_BYTES = 4096
+
+_buffer = b""
+_offset = 0
+_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    """Discard inherited random bytes so forked workers never hand out the same IDs"""
+    global _buffer, _offset, _lock
+    _buffer, _offset, _lock = b"", 0, threading.Lock()
+
+
+# Fork hooks exist only on Unix (Windows workers are spawned, not forked)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def new_session_id() -> str:
+    """
+    Generate a random session ID
+
+    Returns:
+        32-character hex string (128 random bits)
+    """
+    global _buffer, _offset
+
+    with _lock:
+        if _offset + _ID_BYTES > len(_buffer):
+            _buffer = os.urandom(_REFILL_BYTES)
+            _offset = 0
+        chunk = _buffer[_offset:_offset + _ID_BYTES]
+        _offset += _ID_BYTES
+
+    return chunk.hex()
@@ -2,21 +2,97 @@
 LangGraph workflow for customer support agent
 Orchestrates the complete support workflow with conditional routing
 """
+import asyncio
 import logging
-from typing import Literal
-from langgraph.graph import StateGraph, END
+from typing import Any, AsyncIterator, Dict, Literal
+from langgraph.graph import StateGraph, START, END
 
 from app.models.schemas import CustomerSupportState
-from app.agents.classifier import categorize_inquiry
-from app.agents.sentiment import analyze_sentiment
-from app.agents.escalation import escalate_to_human
+from app.config.settings import get_settings
+from app.database.vectordb import asearch_knowledge_base
+from app.agents.sentiment import aanalyze_sentiment
+from app.agents.classifier import acategorize_inquiry
+from app.agents.context import get_request_context
+from app.agents.escalation import escalate_to_human, aescalate_to_human
 from app.agents.handlers import (
-    generate_technical_response,
-    generate_billing_response,
-    generate_general_response
+    agenerate_technical_response,
+    agenerate_billing_response,
+    agenerate_general_response,
+    generate_technical_response_stream,
+    generate_billing_response_stream,
+    generate_general_response_stream
 )
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def embed_query(state: CustomerSupportState) -> Dict[str, Any]:
+    """
+    Embed the query once before the parallel branches
+    
+    Sentiment, category, semantic cache and retrieval all reuse this vector.
+    
+    Args:
+        state: Current workflow state containing customer_query
+        
+    Returns:
+        Dictionary with request_context field
+    """
+    ctx = get_request_context(state)
+    try:
+        await ctx.aembed()
+    except Exception as e:
+        logger.error(f"Error embedding query: {e}")
+    
+    return {"request_context": ctx}
+
+
+async def screen_sentiment(state: CustomerSupportState) -> Dict[str, str]:
+    """
+    Analyze query sentiment (runs in parallel with prefetch)
+    
+    Args:
+        state: Current workflow state containing customer_query and request_context
+        
+    Returns:
+        Dictionary with query_sentiment field
+    """
+    return await aanalyze_sentiment(state)
+
+
+async def prefetch(state: CustomerSupportState) -> Dict[str, Any]:
+    """
+    Categorize the query and retrieve knowledge base documents concurrently
+    
+    Retrieval is category-agnostic so it doesn't have to wait for the
+    classifier; handlers filter the prefetched documents by category afterwards.
+    
+    Args:
+        state: Current workflow state containing customer_query and request_context
+        
+    Returns:
+        Dictionary with query_category and retrieved_docs fields
+    """
+    ctx = get_request_context(state)
+    labels, docs = await asyncio.gather(
+        acategorize_inquiry(state),
+        asearch_knowledge_base(ctx, top_k=settings.rag_prefetch_k)
+    )
+    
+    return {**labels, "retrieved_docs": docs}
+
+
+async def join_branches(state: CustomerSupportState) -> Dict[str, Any]:
+    """Join point for the sentiment and prefetch branches; routing happens on its outgoing edges"""
+    return {}
+
+
+# Category → response handler node; anything else goes to the general handler
+_ROUTE = {
+    "Technical": "generate_technical_response",
+    "Billing": "generate_billing_response",
+}
 
 
 def determine_route(state: CustomerSupportState) -> Literal[
@@ -40,26 +116,15 @@ def determine_route(state: CustomerSupportState) -> Literal[
     Returns:
         Next node name to execute
     """
-    sentiment = state.get("query_sentiment", "Neutral")
-    category = state.get("query_category", "General")
-    
-    logger.info(f"Routing decision: sentiment={sentiment}, category={category}")
-    
     # Priority 1: Escalate negative sentiment
-    if sentiment == "Negative":
-        logger.info("Routing to human escalation (negative sentiment)")
+    if state.get("query_sentiment") == "Negative":
+        logger.debug("Routing to human escalation (negative sentiment)")
         return "escalate_to_human"
     
     # Priority 2: Route by category
-    if category == "Technical":
-        logger.info("Routing to technical response handler")
-        return "generate_technical_response"
-    elif category == "Billing":
-        logger.info("Routing to billing response handler")
-        return "generate_billing_response"
-    else:
-        logger.info("Routing to general response handler")
-        return "generate_general_response"
+    route = _ROUTE.get(state.get("query_category"), "generate_general_response")
+    logger.debug(f"Routing to {route}")
+    return route
 
 
 def create_support_graph() -> StateGraph:
@@ -67,8 +132,10 @@ def create_support_graph() -> StateGraph:
     Create the LangGraph workflow for customer support
     
     Workflow:
-    1. Categorize query (Technical/Billing/General)
-    2. Analyze sentiment (Positive/Neutral/Negative)
+    1. Embed the query
+    2. In parallel: analyze sentiment (Positive/Neutral/Negative), and
+       categorize the query (Technical/Billing/General) alongside
+       knowledge base retrieval
     3. Route based on sentiment and category
     4. Generate appropriate response or escalate
     
@@ -81,23 +148,29 @@ def create_support_graph() -> StateGraph:
     workflow = StateGraph(CustomerSupportState)
     
     # Add nodes for each step
-    workflow.add_node("categorize_inquiry", categorize_inquiry)
-    workflow.add_node("analyze_sentiment", analyze_sentiment)
-    workflow.add_node("escalate_to_human", escalate_to_human)
-    workflow.add_node("generate_technical_response", generate_technical_response)
-    workflow.add_node("generate_billing_response", generate_billing_response)
-    workflow.add_node("generate_general_response", generate_general_response)
+    workflow.add_node("embed_query", embed_query)
+    workflow.add_node("screen_sentiment", screen_sentiment)
+    workflow.add_node("prefetch", prefetch)
+    workflow.add_node("join_branches", join_branches)
+    # Every node is async, so ainvoke never hands work off to a thread
+    workflow.add_node("escalate_to_human", aescalate_to_human)
+    workflow.add_node("generate_technical_response", agenerate_technical_response)
+    workflow.add_node("generate_billing_response", agenerate_billing_response)
+    workflow.add_node("generate_general_response", agenerate_general_response)
     
     # Define the workflow edges
-    # Start with categorization
-    workflow.set_entry_point("categorize_inquiry")
+    workflow.add_edge(START, "embed_query")
+    
+    # Fan out: sentiment and categorization + retrieval run concurrently;
+    # they write disjoint state keys, so LangGraph merges them directly
+    workflow.add_edge("embed_query", "screen_sentiment")
+    workflow.add_edge("embed_query", "prefetch")
     
-    # After categorization, analyze sentiment
-    workflow.add_edge("categorize_inquiry", "analyze_sentiment")
+    # Fan in: wait for both branches before routing
+    workflow.add_edge(["screen_sentiment", "prefetch"], "join_branches")
     
-    # After sentiment analysis, route conditionally
     workflow.add_conditional_edges(
-        "analyze_sentiment",
+        "join_branches",
         determine_route,
         {
             "escalate_to_human": "escalate_to_human",
@@ -124,7 +197,7 @@ def create_support_graph() -> StateGraph:
 compiled_support_agent = create_support_graph()
 
 
-def run_support_agent(customer_query: str, thread_id: str = "default") -> dict:
+async def run_support_agent(customer_query: str, thread_id: str = "default") -> dict:
     """
     Run the customer support agent workflow
     
@@ -139,7 +212,7 @@ def run_support_agent(customer_query: str, thread_id: str = "default") -> dict:
     
     try:
         # Invoke the workflow
-        result = compiled_support_agent.invoke(
+        result = await compiled_support_agent.ainvoke(
             {"customer_query": customer_query},
             {"configurable": {"thread_id": thread_id}}
         )
@@ -150,3 +223,45 @@ def run_support_agent(customer_query: str, thread_id: str = "default") -> dict:
     except Exception as e:
         logger.error(f"Error running support agent: {e}")
         raise
+
+
+# Streaming counterparts of the response handler nodes
+_STREAM_HANDLERS = {
+    "generate_technical_response": generate_technical_response_stream,
+    "generate_billing_response": generate_billing_response_stream,
+    "generate_general_response": generate_general_response_stream,
+}
+
+
+async def astream_final(customer_query: str, thread_id: str = "default") -> AsyncIterator[str]:
+    """
+    Run the support workflow and stream the final response
+    
+    Follows the same steps as the compiled graph (embed, sentiment and
+    prefetch in parallel, route, respond)
+    but yields the handler's output token by token, so the client sees the
+    first token as soon as the LLM produces it.
+    
+    Args:
+        customer_query: The customer's question or issue
+        thread_id: Thread identifier for conversation context
+        
+    Yields:
+        Chunks of the final response text
+    """
+    logger.info(f"Streaming support agent for query: {customer_query[:100]}... (thread: {thread_id})")
+    
+    state: Dict[str, Any] = {"customer_query": customer_query}
+    state.update(await embed_query(state))
+    
+    sentiment, prefetched = await asyncio.gather(screen_sentiment(state), prefetch(state))
+    state.update(sentiment)
+    state.update(prefetched)
+    
+    route = determine_route(state)
+    if route == "escalate_to_human":
+        yield escalate_to_human(state)["final_response"]
+        return
+    
+    async for chunk in _STREAM_HANDLERS[route](state):
+        yield chunk
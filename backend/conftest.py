@@ -0,0 +1,8 @@
+"""
+Pytest configuration
+Makes the app package importable when running `pytest tests/` from backend/
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,17 @@
+"""
+Tests for session ID generation
+"""
+import re
+
+from app.utils import idgen
+
+
+def test_session_ids_are_32_hex_characters():
+    for _ in range(10):
+        assert re.fullmatch(r"[0-9a-f]{32}", idgen.new_session_id())
+
+
+def test_session_ids_are_unique_across_buffer_refills():
+    # Several refills of the 256-ID buffer
+    ids = [idgen.new_session_id() for _ in range(2000)]
+    assert len(set(ids)) == len(ids)
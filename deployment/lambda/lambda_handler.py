@@ -2,6 +2,7 @@
 AWS Lambda Handler for Customer Support Agent
 Serverless deployment using Mangum adapter
 """
+import logging
 import os
 import sys
 
@@ -10,6 +11,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'
 
 from mangum import Mangum
 from app.main import app
+from app.database.vectordb import initialize_vectordb
+
+logger = logging.getLogger(__name__)
+
+# Lifespan doesn't run under Mangum, so do its startup work here, during the
+# Lambda init phase; warm invocations reuse the vector stores. Logging stays
+# on direct handlers: a listener thread could be frozen between invocations
+# and lose queued records when the environment shuts down.
+initialize_vectordb()
 
 # Create Lambda handler using Mangum
 # Mangum adapts FastAPI/Starlette applications for AWS Lambda and API Gateway
@@ -28,7 +38,7 @@ def lambda_handler(event, context):
         API Gateway compatible response
     """
     # Log incoming request
-    print(f"Incoming event: {event.get('httpMethod')} {event.get('path')}")
+    logger.info(f"Incoming event: {event.get('httpMethod')} {event.get('path')}")
     
     # Handle the request using Mangum
     response = handler(event, context)